@@ -0,0 +1,127 @@
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+import httpx
+from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.openrouter import OpenRouterProvider
+
+log = logging.getLogger(__name__)
+
+# ============================================
+# SHARED OPENROUTER TRANSPORT
+# ============================================
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Requests per second allowed to OpenRouter across every agent
+RATE_LIMIT_PER_S = 30.0
+
+
+class _RateLimiter:
+    """Token bucket shared by every outbound OpenRouter request."""
+
+    def __init__(self, rate_per_s: float):
+        self.rate_per_s = rate_per_s
+        self._tokens = rate_per_s
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.rate_per_s,
+                    self._tokens + (now - self._updated) * self.rate_per_s,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_s)
+
+
+class _RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Waits for a limiter token before every request, retries included."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: _RateLimiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._limiter.acquire()
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# One keep-alive HTTP/2 pool for every agent, so racing models share a
+# single TLS connection instead of opening one per call. The API opens it
+# in its lifespan handler; scripts get one lazily on first use.
+client: Optional[httpx.AsyncClient] = None
+
+# One Agent per (model, prompt), built on the current client
+_AGENT_CACHE: Dict[Tuple[str, str], Agent] = {}
+
+
+def open_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if needed."""
+    global client
+    if client is None or client.is_closed:
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+        )
+        # A fresh limiter per client: its lock belongs to the event loop
+        # that first waits on it, and each client lives on a single loop
+        client = httpx.AsyncClient(
+            transport=_RateLimitedTransport(transport, _RateLimiter(RATE_LIMIT_PER_S)),
+            # Fail fast on connecting or waiting for the pool; the agents'
+            # own per-model timeout bounds the overall call
+            timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+        )
+    return client
+
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global client
+    # Cached agents hold the client being closed; rebuild them on next use
+    _AGENT_CACHE.clear()
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+async def warm_up() -> None:
+    """Resolve DNS and finish the TLS handshake before real traffic arrives."""
+    try:
+        # Any response will do - we only want the connection in the pool
+        await open_client().head(OPENROUTER_BASE_URL, timeout=5.0)
+    except httpx.HTTPError as e:
+        log.warning("OpenRouter warm-up failed: %s", e)
+
+
+def openrouter_model(model_name: str) -> OpenAIChatModel:
+    """Build a model for an 'openrouter:<id>' name that uses the shared client."""
+    return OpenAIChatModel(
+        model_name.removeprefix("openrouter:"),
+        provider=OpenRouterProvider(http_client=open_client()),
+    )
+
+
+def get_agent(model_name: str, prompt_key: str, **agent_kwargs: Any) -> Agent:
+    """Return the shared Agent for a (model, prompt) pair, creating it on first use."""
+    agent = _AGENT_CACHE.get((model_name, prompt_key))
+    if agent is None:
+        agent = Agent(openrouter_model(model_name), **agent_kwargs)
+        _AGENT_CACHE[(model_name, prompt_key)] = agent
+    return agent
@@ -1,21 +1,34 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from pydantic_ai import Agent
-from pydantic import BaseModel
-from typing import List
+from typing import List, Optional, Tuple
+import heapq
+import logging
 import sys
 import os
 
 # Import from planning.py
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from agents.planning import StudyPlan, DailyTask
+from agents.planning import StudyPlan, DailyTask, round_hours
+from agents._http import get_agent
+from agents.cache import CanonicalModel, cached_response
+from agents.routing import race_models, try_model
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait for a single model - adjusted plans can run long
+REQUEST_TIMEOUT = 60.0
+
+# Keep-score weights (higher = keep) and per-level duration multipliers
+_PRIO_SCORE = {"High": 3, "Medium": 2, "Low": 1}
+_DIFF_SCORE = {"Hard": 3, "Medium": 2, "Easy": 1}
+_DUR_MULT = {"Critical": 0.5, "High": 0.6, "Medium": 0.8}
 
 # ============================================
 # DATA MODELS
 # ============================================
 
-class AdjustedPlan(BaseModel):
+class AdjustedPlan(CanonicalModel):
     """Modified study plan after burnout detection"""
     original_hours: float
     new_hours: float
@@ -86,77 +99,118 @@ async def adjust_plan_for_burnout(
     upcoming_exams: List[dict],
 ) -> AdjustedPlan:
     """Modify a study plan based on burnout assessment."""
+    # Deterministic cases need no model: Low risk is the identity plan, and
+    # with no exams to protect a High-risk cut is just the priority rules
+    if burnout_level == "Low" or (burnout_level == "High" and not upcoming_exams):
+        return adjust_plan_with_rules(current_plan, burnout_level, upcoming_exams)
+
+    adjusted = await _adjust_with_models(current_plan, burnout_level, upcoming_exams)
+    if adjusted is not None:
+        return adjusted
+    
+    # All models failed - use rule-based adjustment
+    log.warning("⚠️ All AI models failed. Using rule-based plan adjustment.")
+    return adjust_plan_with_rules(current_plan, burnout_level, upcoming_exams)
+
+
+@cached_response("adjust")
+async def _adjust_with_models(
+    current_plan: StudyPlan,
+    burnout_level: str,
+    upcoming_exams: List[dict],
+) -> Optional[AdjustedPlan]:
+    """Race the free models for an adjusted plan. Returns None if every model fails."""
     
     # Build context
-    context = f"""CURRENT STUDY PLAN ({current_plan.date}):
+    parts = [f"""CURRENT STUDY PLAN ({current_plan.date}):
 Total hours: {current_plan.total_hours}
 
 Tasks scheduled:
-"""
+"""]
     
     for i, task in enumerate(current_plan.tasks, 1):
-        context += f"{i}. {task.subject} - {task.topic}\n"
-        context += f"   Type: {task.task_type} | Duration: {task.duration_hours}h | Priority: {task.priority}\n"
+        parts.append(f"{i}. {task.subject} - {task.topic}\n")
+        parts.append(f"   Type: {task.task_type} | Duration: {task.duration_hours}h | Priority: {task.priority}\n")
 
-    context += f"\nBURNOUT LEVEL: {burnout_level}\n\n"
+    parts.append(f"\nBURNOUT LEVEL: {burnout_level}\n\n")
     
-    context += "UPCOMING EXAMS:\n"
-    for exam in upcoming_exams:
-        context += f"- {exam['subject']}: {exam['days_until']} days away\n"
+    parts.append("UPCOMING EXAMS:\n")
+    for subject, days_until in _exam_pairs(upcoming_exams):
+        parts.append(f"- {subject}: {days_until} days away\n")
 
-    context += f"""
+    parts.append(f"""
 TASK: Adjust for {burnout_level} risk. Return JSON only.
-"""
+""")
+    context = "".join(parts)
 
-    # Try multiple free models
+    # Race multiple free models
     FREE_MODELS = [
         'openrouter:meta-llama/llama-3.3-70b-instruct:free',
         'openrouter:qwen/qwen-2.5-7b-instruct:free',
         'openrouter:microsoft/phi-3-mini-128k-instruct:free',
     ]
     
-    import json
+    # Race all models; the first valid answer wins and the rest are cancelled
+    return await race_models(FREE_MODELS, context, _try_model)
+
+
+async def _try_model(model_name: str, context: str) -> Optional[AdjustedPlan]:
+    """Ask a single model for an adjusted plan. Returns None if it fails or times out."""
+    return await try_model(
+        model_name,
+        lambda: get_agent(
+            model_name,
+            "adjust",
+            system_prompt=ADJUSTMENT_SYSTEM_PROMPT,
+            model_settings={'max_tokens': 20000},  # Limit to 20k tokens to match free tier
+        ),
+        context,
+        AdjustedPlan,
+        REQUEST_TIMEOUT,
+    )
+
+
+def _exam_pairs(upcoming_exams: List[dict]) -> List[Tuple[str, int]]:
+    """Flatten exam dicts into (subject, days_until) pairs."""
+    return [(exam['subject'], exam['days_until']) for exam in upcoming_exams]
+
+
+def _allocate(
+    heap: List[Tuple[int, int, float]],
+    target_hours: float,
+    duration_mult: float,
+) -> Tuple[List[Tuple[int, float]], List[int]]:
+    """Numeric core of the rule-based cut, free of Pydantic objects.
     
-    for model_name in FREE_MODELS:
-        try:
-            print(f"\n🔧 Adjusting plan with: {model_name}")
-            
-            # Create fresh agent for this model
-            adjustment_agent = Agent(
-                model_name,
-                system_prompt=ADJUSTMENT_SYSTEM_PROMPT,
-                model_settings={'max_tokens': 20000}  # Limit to 20k tokens to match free tier
-            )
-            
-            result = await adjustment_agent.run(context)
-            response_text = str(result.output)
-            
-            print(f"✅ Got adjustment response from {model_name}")
-            print(f"Response preview: {response_text[:150]}...")
-            
-            # Clean markdown
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            # Parse JSON
-            plan_dict = json.loads(response_text)
-            
-            # Validate
-            if "original_hours" not in plan_dict:
-                raise ValueError("Missing required fields in response")
-            
-            print(f"✅ Plan adjusted: {plan_dict['original_hours']}h → {plan_dict['new_hours']}h")
-            return AdjustedPlan(**plan_dict)
-            
-        except Exception as e:
-            print(f"❌ {model_name} failed: {str(e)[:100]}")
-            continue
+    Pops (-score, index, duration) entries highest score first and shortens
+    each by duration_mult until target_hours is reached. Returns the kept
+    (index, new_duration) pairs and the dropped indices, both in score order.
+    """
+    kept = []
+    dropped = []
+    hours_allocated = 0.0
     
-    # All models failed - use rule-based adjustment
-    print("\n⚠️ All AI models failed. Using rule-based plan adjustment.")
-    return adjust_plan_with_rules(current_plan, burnout_level, upcoming_exams)
+    # Highest score pops first; only the tasks we actually consider are popped
+    heapq.heapify(heap)
+    while heap:
+        if hours_allocated >= target_hours:
+            # Reached target hours - drop remaining tasks
+            dropped.extend(idx for _, idx, _ in sorted(heap))
+            break
+        
+        _, idx, duration = heapq.heappop(heap)
+        
+        # Don't make tasks too short
+        new_duration = max(0.5, duration * duration_mult)
+        
+        # Check if we can fit this task
+        if hours_allocated + new_duration <= target_hours * 1.1:  # 10% buffer
+            kept.append((idx, new_duration))
+            hours_allocated += new_duration
+        else:
+            dropped.append(idx)
+    
+    return kept, dropped
 
 
 def adjust_plan_with_rules(
@@ -182,68 +236,60 @@ def adjust_plan_with_rules(
         reduction = 0.0
         rest_days = 0
     
+    # Nothing to cut - skip scoring and hand the plan back unchanged
+    if reduction == 0.0:
+        return AdjustedPlan(
+            original_hours=original_hours,
+            new_hours=original_hours,
+            removed_tasks=[],
+            modified_tasks=list(current_plan.tasks),
+            rest_days_added=0,
+            rationale="No adjustment needed; burnout risk is low."
+        )
+    
     target_hours = original_hours * (1 - reduction)
     
     # Get urgent exams (within 3 days)
-    urgent_subjects = {exam['subject'] for exam in upcoming_exams if exam['days_until'] <= 3}
+    urgent_subjects = frozenset(
+        subject for subject, days_until in _exam_pairs(upcoming_exams) if days_until <= 3
+    )
     
     # Sort tasks by priority (keep high priority, remove low priority)
-    priority_scores = {"High": 3, "Medium": 2, "Low": 1}
-    difficulty_scores = {"Hard": 3, "Medium": 2, "Easy": 1}
-    
-    scored_tasks = []
-    for task in current_plan.tasks:
+    # Max-heap of (-score, plan index, duration); the index keeps ties in plan order
+    heap = []
+    for idx, task in enumerate(current_plan.tasks):
         # Calculate keep score (higher = keep)
         score = 0
-        score += priority_scores[task.priority] * 10
-        score += difficulty_scores.get(task.priority, 2) * 5
+        score += _PRIO_SCORE[task.priority] * 10
+        score += _DIFF_SCORE.get(task.priority, 2) * 5
         if task.subject in urgent_subjects:
             score += 50  # Urgent exams get high priority
         
-        scored_tasks.append((score, task))
+        heap.append((-score, idx, task.duration_hours))
     
-    # Sort by score descending (highest score first)
-    scored_tasks.sort(key=lambda x: x[0], reverse=True)
+    kept, dropped = _allocate(heap, target_hours, _DUR_MULT[burnout_level])
     
     # Build new plan
     modified_tasks = []
-    removed_tasks = []
     hours_allocated = 0
+    for idx, new_duration in kept:
+        task = current_plan.tasks[idx]
+        # Trusted values derived from a validated plan - skip re-validation
+        modified_tasks.append(DailyTask.model_construct(
+            subject=task.subject,
+            topic=task.topic,
+            duration_hours=round_hours(new_duration),
+            task_type=task.task_type,
+            priority=task.priority,
+            notes=f"Reduced from {task.duration_hours}h due to {burnout_level} burnout risk"
+        ))
+        hours_allocated += new_duration
     
-    for score, task in scored_tasks:
-        if hours_allocated >= target_hours:
-            # Reached target hours - remove remaining tasks
-            removed_tasks.append(f"{task.subject} - {task.topic}")
-            continue
-        
-        # Calculate new duration
-        if burnout_level == "Critical":
-            new_duration = task.duration_hours * 0.5
-        elif burnout_level == "High":
-            new_duration = task.duration_hours * 0.6
-        elif burnout_level == "Medium":
-            new_duration = task.duration_hours * 0.8
-        else:
-            new_duration = task.duration_hours
-        
-        # Don't make tasks too short
-        new_duration = max(0.5, new_duration)
-        
-        # Check if we can fit this task
-        if hours_allocated + new_duration <= target_hours * 1.1:  # 10% buffer
-            modified_tasks.append(DailyTask(
-                subject=task.subject,
-                topic=task.topic,
-                duration_hours=round(new_duration, 1),
-                task_type=task.task_type,
-                priority=task.priority,
-                notes=f"Reduced from {task.duration_hours}h due to {burnout_level} burnout risk"
-            ))
-            hours_allocated += new_duration
-        else:
-            removed_tasks.append(f"{task.subject} - {task.topic}")
+    removed_tasks = [
+        f"{current_plan.tasks[idx].subject} - {current_plan.tasks[idx].topic}" for idx in dropped
+    ]
     
-    new_hours = round(hours_allocated, 1)
+    new_hours = round_hours(hours_allocated)
     
     # Generate rationale
     rationale = f"Adjusted plan due to {burnout_level} burnout risk. "
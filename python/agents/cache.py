@@ -0,0 +1,264 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional, get_type_hints
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+from pydantic_core import to_jsonable_python
+
+# ============================================
+# RESPONSE CACHE (Shared across agents)
+# ============================================
+
+# Most responses kept in memory before the least frequently used is evicted
+CACHE_MAX_ENTRIES = 10_000
+
+# Seconds a cached response stays valid
+CACHE_TTL_S = 24 * 60 * 60
+
+# Optional JSONL checkpoint so responses survive a restart (off when unset)
+CACHE_FILE = os.getenv("AGENT_CACHE_FILE")
+
+
+class ResponseCache:
+    """In-memory LFU cache of agent responses with a per-entry TTL.
+
+    When full, the entry with the fewest hits is evicted (the oldest on a
+    tie), so popular responses outlive one-offs. Entries sit in per-count
+    buckets, making every operation O(1). Hit counts are halved after every
+    `max_entries` stores, so entries that were popular once but no longer
+    are hit eventually make room for new ones.
+
+    With a `path`, every stored response is also appended to a JSONL
+    checkpoint and reloaded on startup, so a restarted process doesn't pay
+    for the same LLM calls again. Reloaded entries come back as raw JSON
+    strings until the caller validates them. The file is compacted down to
+    the live entries on startup and whenever hit counts are aged.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_s: float = CACHE_TTL_S,
+        path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.path = path
+        # key -> [expires_at, value, count, raw JSON or None], in insertion order
+        self._entries: Dict[str, list] = {}
+        # count -> keys with that count, oldest first (dicts used as ordered sets)
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._min_count = 1
+        self._stores_since_aging = 0
+        if path and os.path.exists(path):
+            self._load_checkpoint()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() > entry[0]:
+            self.discard(key)
+            return None
+        if self._unlink(key, entry[2]) and entry[2] == self._min_count:
+            self._min_count += 1
+        entry[2] += 1
+        self._buckets.setdefault(entry[2], {})[key] = None
+        return entry[1]
+
+    def set(self, key: str, value: Any, raw: Optional[str] = None) -> None:
+        """Store a value; `raw` is its JSON form, written to the checkpoint if enabled."""
+        expires_at = time.time() + self.ttl_s
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0], entry[1], entry[3] = expires_at, value, raw
+        else:
+            self._insert(key, expires_at, value, raw)
+
+        if self.path and raw is not None:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "expires_at": expires_at, "value": raw}) + "\n")
+
+        self._stores_since_aging += 1
+        if self._stores_since_aging >= self.max_entries:
+            self._age()
+            if self.path:
+                self._compact()
+
+    def replace(self, key: str, value: Any) -> None:
+        """Swap a live entry's value, keeping its expiry and hit count."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[1] = value
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._unlink(key, entry[2]) and entry[2] == self._min_count:
+            self._min_count = min(self._buckets, default=1)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+        self._min_count = 1
+
+    def _insert(self, key: str, expires_at: float, value: Any, raw: Optional[str]) -> None:
+        # Make room first so the newcomer itself is never the victim
+        if len(self._entries) >= self.max_entries:
+            self.discard(next(iter(self._buckets[self._min_count])))
+        self._entries[key] = [expires_at, value, 1, raw]
+        self._buckets.setdefault(1, {})[key] = None
+        self._min_count = 1
+
+    def _unlink(self, key: str, count: int) -> bool:
+        """Take a key out of its count bucket; True if that emptied the bucket."""
+        bucket = self._buckets[count]
+        del bucket[key]
+        if bucket:
+            return False
+        del self._buckets[count]
+        return True
+
+    def _age(self) -> None:
+        """Halve every hit count, keeping insertion order within each count."""
+        self._stores_since_aging = 0
+        self._buckets.clear()
+        for key, entry in self._entries.items():
+            entry[2] = max(1, entry[2] // 2)
+            self._buckets.setdefault(entry[2], {})[key] = None
+        self._min_count = min(self._buckets, default=1)
+
+    def _load_checkpoint(self) -> None:
+        now = time.time()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                # Skip torn lines from a crash mid-write and anything else
+                # that isn't a well-formed record, rather than fail at import
+                try:
+                    record = json.loads(line)
+                    key, expires_at, raw = record["key"], float(record["expires_at"]), record["value"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if not isinstance(key, str) or not isinstance(raw, str):
+                    continue
+                if expires_at > now:
+                    # Re-insert so a rewritten key takes its latest position
+                    self.discard(key)
+                    self._insert(key, expires_at, raw, raw)
+        self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the checkpoint with just the live entries.
+
+        Writes a sibling file and swaps it in, so a crash here can't lose
+        the checkpoint.
+        """
+        now = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, (expires_at, _, _, raw) in self._entries.items():
+                if raw is not None and expires_at > now:
+                    f.write(json.dumps({"key": key, "expires_at": expires_at, "value": raw}) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+_CACHE = ResponseCache(path=CACHE_FILE)
+
+# Calls currently running, by cache key, so identical concurrent calls share one
+_INFLIGHT: Dict[str, "asyncio.Task"] = {}
+
+
+class CanonicalModel(BaseModel):
+    """Immutable agent model that serializes its canonical JSON at most once."""
+    model_config = ConfigDict(frozen=True)
+
+    @functools.cached_property
+    def canonical_json(self) -> str:
+        """Compact JSON with sorted keys - equal models give identical strings."""
+        return json.dumps(self.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+
+    def model_copy(self, *, update=None, deep=False):
+        copied = super().model_copy(update=update, deep=deep)
+        # The copy inherits our __dict__, including a now-stale canonical_json
+        copied.__dict__.pop("canonical_json", None)
+        return copied
+
+
+def _jsonable(obj: Any) -> Any:
+    if isinstance(obj, CanonicalModel):
+        return obj.canonical_json
+    return to_jsonable_python(obj)
+
+
+def cache_key(namespace: str, payload: Any) -> str:
+    """Hash a JSON-able payload (Pydantic models included) into a stable key."""
+    blob = json.dumps(payload, default=_jsonable, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{namespace}:{blob}".encode()).hexdigest()
+
+
+def cached_response(
+    namespace: str,
+    canonicalize: Optional[Callable[..., Any]] = None,
+    admit: Optional[Callable[..., bool]] = None,
+):
+    """Serve repeat calls of an async agent function from the response cache.
+
+    The key is built from `canonicalize(*args, **kwargs)` when given (so
+    equivalent inputs share an entry), otherwise from all arguments.
+    Calls for which `admit(*args, **kwargs)` is false bypass the cache.
+    A None result means every model failed and is never cached.
+
+    Identical calls made while one is already running await that call
+    instead of starting their own, whether or not they are admitted.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        adapter = TypeAdapter(get_type_hints(fn)["return"])
+
+        async def call_and_store(key: str, admitted: bool, args, kwargs):
+            result = await fn(*args, **kwargs)
+            if admitted and result is not None:
+                raw = adapter.dump_json(result).decode() if _CACHE.path else None
+                _CACHE.set(key, result, raw=raw)
+            return result
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if canonicalize is not None:
+                payload = canonicalize(*args, **kwargs)
+            else:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                payload = bound.arguments
+            key = cache_key(namespace, payload)
+            admitted = admit is None or admit(*args, **kwargs)
+
+            if admitted:
+                cached = _CACHE.get(key)
+                if isinstance(cached, str):
+                    # Restored from the checkpoint file - validate once and keep the model
+                    try:
+                        cached = adapter.validate_json(cached)
+                        _CACHE.replace(key, cached)
+                    except ValidationError:
+                        # Stale schema or a hand-edited file - ask the models again
+                        _CACHE.discard(key)
+                        cached = None
+                if cached is not None:
+                    return cached
+
+            task = _INFLIGHT.get(key)
+            if task is None:
+                task = asyncio.create_task(call_and_store(key, admitted, args, kwargs))
+                _INFLIGHT[key] = task
+                task.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+            # Shielded so one caller going away doesn't cancel the others' call
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    return decorator
@@ -1,17 +1,42 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from pydantic_ai import Agent
-from pydantic import BaseModel
-from typing import List, Literal
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta
+import logging
 import os
 
+from agents._http import get_agent
+from agents.cache import CanonicalModel, cached_response
+from agents.routing import race_models, try_model
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait for a single model - a full week of JSON takes a while
+REQUEST_TIMEOUT = 90.0
+
+# Sort rank for subject priorities (lower sorts first)
+_PRIO_RANK = {'High': 0, 'Medium': 1, 'Low': 2}
+
+# Fallback time multiplier per subject difficulty
+_DIFF_MULT = {'Easy': 0.8, 'Medium': 1.0, 'Hard': 1.2}
+
+# Fallback week layout: (task type, topic suffix) per day, None for rest
+_DAY_META = [
+    ("Learn", "Introduction & Core Concepts"),
+    ("Learn", "Introduction & Core Concepts"),
+    ("Revise", "Review & Practice"),
+    ("Revise", "Review & Practice"),
+    ("Practice", "Problem Solving & Mock Tests"),
+    ("Practice", "Problem Solving & Mock Tests"),
+    None,
+]
+
 # ============================================
 # DATA MODELS
 # ============================================
 
-class Subject(BaseModel):
+class Subject(CanonicalModel):
     """A subject the user needs to study"""
     name: str
     priority: Literal["High", "Medium", "Low"]
@@ -20,7 +45,7 @@ class Subject(BaseModel):
     exam_date: str
     hours_needed: float
 
-class DailyTask(BaseModel):
+class DailyTask(CanonicalModel):
     """A single study task for a day"""
     subject: str
     topic: str
@@ -29,14 +54,14 @@ class DailyTask(BaseModel):
     priority: Literal["High", "Medium", "Low"]
     notes: str = ""
 
-class StudyPlan(BaseModel):
+class StudyPlan(CanonicalModel):
     """A single day's study plan"""
     date: str
     tasks: List[DailyTask]
     total_hours: float
     rest_recommended: bool = False
 
-class WeeklyPlan(BaseModel):
+class WeeklyPlan(CanonicalModel):
     """A full week's study plan"""
     week_number: int
     days: List[StudyPlan]
@@ -46,6 +71,9 @@ class WeeklyPlan(BaseModel):
 # PLANNING AGENT (Pydantic AI v1.44 - NO result_type)
 # ============================================
 
+# Every static instruction lives here, ahead of the per-user prompt, so the
+# prefix is byte-identical across calls and providers can reuse its cache
+
 PLANNING_SYSTEM_PROMPT = """You are an expert study planner for students preparing for exams.
 
 Your role:
@@ -71,6 +99,14 @@ Spaced Repetition Logic:
 - Add a "Practice" task for the same topic on Day 7
 - This only applies to Hard or Medium difficulty topics
 
+For each day of the plan:
+1. Allocate tasks within the user's daily hour limit
+2. Avoid fixed commitment time blocks
+3. Apply spaced repetition for harder topics
+4. Prioritize subjects with closer exam dates
+5. Balance subjects across the week
+6. Mark if a rest day is recommended
+
 IMPORTANT: You MUST respond with valid JSON matching the WeeklyPlan structure.
 
 WeeklyPlan structure:
@@ -96,7 +132,7 @@ WeeklyPlan structure:
   "burnout_risk": "Low"
 }
 
-Return ONLY valid JSON, no markdown, no code blocks.""",
+Return ONLY valid JSON, no markdown, no code blocks."""
 
 
 # ============================================
@@ -110,9 +146,62 @@ async def generate_study_plan(
     start_date: str,
 ) -> WeeklyPlan:
     """Generate a 7-day study plan using the Planning Agent."""
+    plan = await _plan_with_models(subjects, available_hours_per_day, fixed_commitments, start_date)
+    if plan is not None:
+        return plan
     
-    # Build context
-    context = f"""
+    # All models failed - use fallback
+    log.warning("⚠️ All AI models failed. Using intelligent fallback plan.")
+    return create_fallback_plan(subjects, available_hours_per_day, start_date)
+
+
+def _plan_cache_input(
+    subjects: List[Subject],
+    available_hours_per_day: float,
+    fixed_commitments: dict,
+    start_date: str,
+) -> dict:
+    """Canonical form of the plan inputs: subject order and hour noise don't matter."""
+    return {
+        "subjects": [
+            {**s.model_dump(), "hours_needed": round(s.hours_needed, 1)}
+            for s in sorted(subjects, key=lambda s: s.name)
+        ],
+        "available_hours_per_day": round(available_hours_per_day, 1),
+        "fixed_commitments": fixed_commitments,
+        "start_date": start_date,
+    }
+
+
+def _plan_cache_admit(
+    subjects: List[Subject],
+    available_hours_per_day: float,
+    fixed_commitments: dict,
+    start_date: str,
+) -> bool:
+    """Only cache plans likely to be requested again verbatim.
+
+    Light schedules, single-subject plans and plans for an exam within
+    3 days are too personal to be worth an entry.
+    """
+    if available_hours_per_day < 3 or len(subjects) < 2:
+        return False
+    start = datetime.fromisoformat(start_date)
+    return all((datetime.fromisoformat(s.exam_date) - start).days > 3 for s in subjects)
+
+
+@cached_response("plan", canonicalize=_plan_cache_input, admit=_plan_cache_admit)
+async def _plan_with_models(
+    subjects: List[Subject],
+    available_hours_per_day: float,
+    fixed_commitments: dict,
+    start_date: str,
+) -> Optional[WeeklyPlan]:
+    """Race the free models for a plan. Returns None if every model fails."""
+    
+    # Build context - the whole week is requested in one prompt, so each
+    # model is called once per plan rather than once per day
+    parts = [f"""
 USER INPUT:
 - Subjects to study: {[s.name for s in subjects]}
 - Maximum study hours per day: {available_hours_per_day}
@@ -120,39 +209,29 @@ USER INPUT:
 - Fixed commitments (busy hours): {fixed_commitments}
 
 SUBJECT DETAILS:
-"""
+"""]
     
+    start = datetime.fromisoformat(start_date)
     for subj in subjects:
-        days_until_exam = (
-            datetime.fromisoformat(subj.exam_date) - 
-            datetime.fromisoformat(start_date)
-        ).days
+        days_until_exam = (datetime.fromisoformat(subj.exam_date) - start).days
         
-        context += f"""
+        parts.append(f"""
 {subj.name}:
   - Priority: {subj.priority}
   - Difficulty: {subj.difficulty}
   - Is a weak area: {subj.is_weak}
   - Exam in {days_until_exam} days
   - Total hours needed: {subj.hours_needed}
-"""
+""")
 
-    context += f"""
+    parts.append(f"""
 TASK:
-Create a detailed 7-day study plan starting from {start_date}.
-
-For each day:
-1. Allocate tasks within the {available_hours_per_day} hour limit
-2. Avoid fixed commitment time blocks
-3. Apply spaced repetition for harder topics
-4. Prioritize subjects with closer exam dates
-5. Balance subjects across the week
-6. Mark if a rest day is recommended
+Create a detailed 7-day study plan starting from {start_date}, within {available_hours_per_day} hours per day.
+Return ONLY valid JSON in WeeklyPlan format.
+""")
+    context = "".join(parts)
 
-Return ONLY valid JSON in WeeklyPlan format. No markdown, no explanations.
-"""
-
-    # List of free models to try (in order of preference)
+    # List of free models to race (in order of preference)
     FREE_MODELS = [
         'openrouter:deepseek/deepseek-chat:free',
         'openrouter:meta-llama/llama-3.3-70b-instruct:free',
@@ -161,48 +240,28 @@ Return ONLY valid JSON in WeeklyPlan format. No markdown, no explanations.
         'openrouter:microsoft/phi-3-mini-128k-instruct:free',
     ]
     
-    import json
-    
-    # Try each model
-    for model_name in FREE_MODELS:
-        try:
-            print(f"\n🤖 Trying model: {model_name}")
-            
-            # Create agent with this model
-            temp_agent = Agent(
-                model_name,
-                system_prompt=PLANNING_SYSTEM_PROMPT
-            )
-            
-            result = await temp_agent.run(context)
-            response_text = str(result.output)
-            
-            print(f"✅ Got response from {model_name}")
-            print(f"Response preview: {response_text[:200]}...")
-            
-            # Clean markdown code blocks
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            # Parse JSON
-            plan_dict = json.loads(response_text)
-            
-            # Validate required fields
-            if "week_number" not in plan_dict or "days" not in plan_dict:
-                raise ValueError("Missing required fields in response")
-            
-            print(f"✅ Successfully generated plan with {model_name}!")
-            return WeeklyPlan(**plan_dict)
-            
-        except Exception as e:
-            print(f"❌ {model_name} failed: {str(e)[:100]}")
-            continue  # Try next model
-    
-    # All models failed - use fallback
-    print("\n⚠️ All AI models failed. Using intelligent fallback plan.")
-    return create_fallback_plan(subjects, available_hours_per_day, start_date)
+    # Race all models; the first valid answer wins and the rest are cancelled
+    return await race_models(FREE_MODELS, context, _try_model)
+
+
+async def _try_model(model_name: str, context: str) -> Optional[WeeklyPlan]:
+    """Ask a single model for a plan. Returns None if it fails or times out."""
+    return await try_model(
+        model_name,
+        lambda: get_agent(
+            model_name,
+            "plan",
+            system_prompt=PLANNING_SYSTEM_PROMPT,
+        ),
+        context,
+        WeeklyPlan,
+        REQUEST_TIMEOUT,
+    )
+
+
+def round_hours(x: float) -> float:
+    """Round a non-negative number of hours to 0.1 without float round()."""
+    return int(x * 10.0 + 0.5) / 10.0
 
 
 def create_fallback_plan(
@@ -211,26 +270,30 @@ def create_fallback_plan(
     start_date: str,
 ) -> WeeklyPlan:
     """Create a high-quality fallback plan if AI fails."""
-    from datetime import datetime, timedelta
-    
+    # Built only from validated inputs, so models skip re-validation via model_construct
     days = []
     start = datetime.fromisoformat(start_date)
+    date_strs = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(len(_DAY_META))]
     
-    # Sort subjects by priority and exam date
-    sorted_subjects = sorted(
-        subjects,
-        key=lambda s: (
-            {'High': 0, 'Medium': 1, 'Low': 2}[s.priority],
-            datetime.fromisoformat(s.exam_date)
-        )
-    )
+    # Parse each exam date once, then sort subjects by priority and exam date
+    parsed = [(s, datetime.fromisoformat(s.exam_date)) for s in subjects]
+    sorted_subjects = sorted(parsed, key=lambda p: (_PRIO_RANK[p[0].priority], p[1]))
     
-    for day_num in range(7):
-        current_date = (start + timedelta(days=day_num)).strftime("%Y-%m-%d")
+    # A subject's daily base time doesn't depend on the day, so work it out once
+    subject_times = []
+    for subject, exam_dt in sorted_subjects:
+        days_until_exam = (exam_dt - start).days
+        urgency = max(0.5, 1.0 - (days_until_exam / 30))  # More time if exam is closer
         
+        # Difficulty multiplier
+        difficulty_mult = _DIFF_MULT[subject.difficulty]
+        
+        subject_times.append((subject, (subject.hours_needed / 7) * difficulty_mult * urgency))
+    
+    for current_date, meta in zip(date_strs, _DAY_META):
         # Rest day on Sunday (day 6)
-        if day_num == 6:
-            days.append(StudyPlan(
+        if meta is None:
+            days.append(StudyPlan.model_construct(
                 date=current_date,
                 tasks=[],
                 total_hours=0.0,
@@ -242,19 +305,11 @@ def create_fallback_plan(
         hours_used = 0
         
         # Distribute hours across subjects
-        for i, subject in enumerate(sorted_subjects):
+        for subject, base_time in subject_times:
             if hours_used >= available_hours_per_day:
                 break
             
-            # Calculate time for this subject
-            days_until_exam = (datetime.fromisoformat(subject.exam_date) - start).days
-            urgency = max(0.5, 1.0 - (days_until_exam / 30))  # More time if exam is closer
-            
-            # Difficulty multiplier
-            difficulty_mult = {'Easy': 0.8, 'Medium': 1.0, 'Hard': 1.2}[subject.difficulty]
-            
             # Calculate time slot
-            base_time = (subject.hours_needed / 7) * difficulty_mult * urgency
             time_slot = min(
                 base_time,
                 available_hours_per_day - hours_used,
@@ -264,21 +319,13 @@ def create_fallback_plan(
             if time_slot < 0.5:
                 continue  # Skip if less than 30 min
             
-            # Determine task type based on day
-            if day_num < 2:
-                task_type = "Learn"
-                topic_suffix = "Introduction & Core Concepts"
-            elif day_num < 4:
-                task_type = "Revise"
-                topic_suffix = "Review & Practice"
-            else:
-                task_type = "Practice"
-                topic_suffix = "Problem Solving & Mock Tests"
+            # Task type based on day
+            task_type, topic_suffix = meta
             
-            tasks.append(DailyTask(
+            tasks.append(DailyTask.model_construct(
                 subject=subject.name,
                 topic=f"{subject.name} - {topic_suffix}",
-                duration_hours=round(time_slot, 1),
+                duration_hours=round_hours(time_slot),
                 task_type=task_type,
                 priority=subject.priority,
                 notes=f"{'⚠️ Weak area - ' if subject.is_weak else ''}Focus on {subject.difficulty.lower()} difficulty topics"
@@ -289,10 +336,10 @@ def create_fallback_plan(
         # Determine burnout risk
         burnout_risk = "Medium" if hours_used > available_hours_per_day * 0.9 else "Low"
         
-        days.append(StudyPlan(
+        days.append(StudyPlan.model_construct(
             date=current_date,
             tasks=tasks,
-            total_hours=round(hours_used, 1),
+            total_hours=round_hours(hours_used),
             rest_recommended=False
         ))
     
@@ -300,7 +347,7 @@ def create_fallback_plan(
     avg_hours = sum(d.total_hours for d in days) / len([d for d in days if not d.rest_recommended])
     overall_risk = "High" if avg_hours > available_hours_per_day * 0.95 else "Medium" if avg_hours > available_hours_per_day * 0.8 else "Low"
     
-    return WeeklyPlan(
+    return WeeklyPlan.model_construct(
         week_number=1,
         days=days,
         burnout_risk=overall_risk
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from pydantic_ai import Agent
+
+log = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+# ============================================
+# MODEL HEALTH TRACKING (Shared across agents)
+# ============================================
+
+# Skip a model after this many failures in a row...
+FAIL_STREAK_LIMIT = 3
+
+# ...until this many seconds have passed since its last failure
+FAIL_COOLDOWN_S = 60.0
+
+# Weight of the newest sample in the latency moving average
+LATENCY_EWMA_ALPHA = 0.2
+
+# Body of a ```json / ``` fenced block (an unterminated fence runs to the end)
+_FENCE_RE = re.compile(r"```(?:json)?(.*?)(?:```|\Z)", re.DOTALL)
+
+_MODEL_STATS: Dict[str, dict] = {}
+
+
+def _stats_for(model_name: str) -> dict:
+    stats = _MODEL_STATS.get(model_name)
+    if stats is None:
+        stats = {"ewma_latency_s": 0.0, "fail_streak": 0, "last_failure_ts": 0.0}
+        _MODEL_STATS[model_name] = stats
+    return stats
+
+
+def rank_models(models: List[str]) -> List[str]:
+    """Order models by recent health, dropping ones whose circuit is open.
+
+    Models with fewer consecutive failures come first, then faster ones.
+    Untried models keep their listed order. If every model is tripped,
+    all of them are returned so the caller still gets a chance.
+    """
+    now = time.monotonic()
+    available = []
+    for model_name in models:
+        stats = _stats_for(model_name)
+        tripped = (
+            stats["fail_streak"] >= FAIL_STREAK_LIMIT
+            and now - stats["last_failure_ts"] <= FAIL_COOLDOWN_S
+        )
+        if not tripped:
+            available.append(model_name)
+
+    return sorted(
+        available or models,
+        key=lambda m: (_MODEL_STATS[m]["fail_streak"], _MODEL_STATS[m]["ewma_latency_s"]),
+    )
+
+
+def record_success(model_name: str, latency_s: float) -> None:
+    """Reset the failure streak and fold the latency into the average."""
+    stats = _stats_for(model_name)
+    if stats["ewma_latency_s"] == 0.0:
+        stats["ewma_latency_s"] = latency_s
+    else:
+        stats["ewma_latency_s"] = (
+            LATENCY_EWMA_ALPHA * latency_s
+            + (1 - LATENCY_EWMA_ALPHA) * stats["ewma_latency_s"]
+        )
+    stats["fail_streak"] = 0
+
+
+def record_failure(model_name: str) -> None:
+    """Count a failed or timed-out attempt against the model."""
+    stats = _stats_for(model_name)
+    stats["fail_streak"] += 1
+    stats["last_failure_ts"] = time.monotonic()
+
+
+# ============================================
+# MODEL RACING (Shared across agents)
+# ============================================
+
+async def try_model(
+    model_name: str,
+    make_agent: Callable[[], Agent],
+    context: str,
+    model_cls: Type[M],
+    timeout_s: float,
+) -> Optional[M]:
+    """Ask a single model for a `model_cls` as JSON. Returns None if it fails or
+    takes longer than `timeout_s`.
+    
+    The agent comes from `make_agent()` inside the try, so a construction
+    error (e.g. a missing API key) is a failed attempt like any other.
+    """
+    try:
+        started = time.perf_counter()
+        log.debug("🤖 Trying model: %s", model_name)
+        
+        agent = make_agent()
+        result = await asyncio.wait_for(agent.run(context), timeout=timeout_s)
+        response_text = str(result.output)
+        
+        log.debug("✅ Got response from %s", model_name)
+        log.debug("Response preview: %.200s...", response_text)
+        
+        # Clean markdown code blocks
+        m = _FENCE_RE.search(response_text)
+        response_text = m.group(1).strip() if m else response_text.strip()
+        
+        # Parse and validate JSON in one step
+        parsed = model_cls.model_validate_json(response_text)
+        
+        log.info("✅ %s answered with a valid %s", model_name, model_cls.__name__)
+        record_success(model_name, time.perf_counter() - started)
+        return parsed
+        
+    except Exception as e:
+        log.warning("❌ %s failed: %.100s", model_name, e)
+        record_failure(model_name)
+        return None
+
+
+async def race_models(
+    models: List[str],
+    context: str,
+    try_one: Callable[[str, str], Awaitable[Optional[M]]],
+) -> Optional[M]:
+    """Call `try_one(model, context)` for every healthy model at once.
+    
+    The first non-None result wins and the other calls are cancelled.
+    Returns None if every model fails.
+    """
+    # Healthiest models first; ones failing repeatedly sit out a cooldown
+    tasks = [asyncio.create_task(try_one(m, context)) for m in rank_models(models)]
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            winner = None
+            # Read every finished task, so none is left with an unretrieved exception
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    log.warning("❌ Model attempt raised: %.100s", e)
+                    result = None
+                if winner is None:
+                    winner = result
+            if winner is not None:
+                return winner
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    return None
@@ -1,15 +1,23 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from pydantic_ai import Agent
-from pydantic import BaseModel
-from typing import List, Literal
+from typing import List, Literal, NamedTuple, Optional
+import logging
+
+from agents._http import get_agent
+from agents.cache import CanonicalModel, cached_response
+from agents.routing import race_models, try_model
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait for a single model - assessments are short
+REQUEST_TIMEOUT = 20.0
 
 # ============================================
 # DATA MODELS
 # ============================================
 
-class MoodEntry(BaseModel):
+class MoodEntry(CanonicalModel):
     """A single day's mood check-in data"""
     date: str
     mood: Literal["Energized", "Okay", "Tired", "Burned out"]
@@ -18,7 +26,7 @@ class MoodEntry(BaseModel):
     actual_hours: float
     focus_level: Literal["High", "Medium", "Low"] = "Medium"
 
-class BurnoutAssessment(BaseModel):
+class BurnoutAssessment(CanonicalModel):
     """Burnout risk assessment result"""
     risk_level: Literal["Low", "Medium", "High", "Critical"]
     risk_score: float
@@ -65,99 +73,150 @@ Return ONLY JSON:
 
 async def assess_burnout(mood_history: List[MoodEntry]) -> BurnoutAssessment:
     """Detect burnout risk from mood and study pattern data."""
+    if not mood_history:
+        # Nothing for a model to analyze
+        return detect_burnout_with_rules(mood_history)
+    
+    assessment = await _assess_with_models(mood_history)
+    if assessment is not None:
+        return assessment
+    
+    # All models failed - use rule-based fallback
+    log.warning("⚠️ All AI models failed. Using rule-based burnout detection.")
+    return detect_burnout_with_rules(mood_history)
+
+
+@cached_response("wellness")
+async def _assess_with_models(mood_history: List[MoodEntry]) -> Optional[BurnoutAssessment]:
+    """Race the free models for an assessment. Returns None if every model fails."""
     
     # Build concise context
-    context = f"Analyze {len(mood_history)} days of mood data:\n\n"
+    parts = [f"Analyze {len(mood_history)} days of mood data:\n\n"]
     
     for i, entry in enumerate(mood_history, 1):
         completion = (entry.actual_hours / entry.planned_hours * 100) if entry.planned_hours > 0 else 0
-        context += f"Day {i}: {entry.mood} ({entry.mood_score}/4) | Planned: {entry.planned_hours}h, Actual: {entry.actual_hours}h ({completion:.0f}%) | Focus: {entry.focus_level}\n"
+        parts.append(f"Day {i}: {entry.mood} ({entry.mood_score}/4) | Planned: {entry.planned_hours}h, Actual: {entry.actual_hours}h ({completion:.0f}%) | Focus: {entry.focus_level}\n")
 
-    context += "\nDetect burnout signals and provide risk assessment. Return JSON only, no markdown."
+    # Pre-computed aggregates so the model doesn't have to do the arithmetic
+    stats = _mood_stats(mood_history)
+    parts.append(
+        f"\nSummary: avg mood {stats.avg_mood:.1f}/4, trend {stats.mood_trend:+.2f}/day | "
+        f"Over plan: {stats.overwork_days} days | Under 70% of plan: {stats.skipped_days} days | "
+        f"Low focus: {stats.low_focus_days} days\n"
+    )
 
-    # Try multiple free models
+    parts.append("\nDetect burnout signals and provide risk assessment. Return JSON only, no markdown.")
+    context = "".join(parts)
+
+    # Race multiple free models
     FREE_MODELS = [
         'openrouter:meta-llama/llama-3.3-70b-instruct:free',
         'openrouter:qwen/qwen-2.5-7b-instruct:free',
         'openrouter:microsoft/phi-3-mini-128k-instruct:free',
     ]
     
-    import json
-    
-    for model_name in FREE_MODELS:
-        try:
-            print(f"\n🔍 Checking burnout with: {model_name}")
-            
-            # Create fresh agent for this model
-            wellness_agent = Agent(
-                model_name,
-                system_prompt=WELLNESS_SYSTEM_PROMPT
-            )
-            
-            result = await wellness_agent.run(context)
-            response_text = str(result.output)
-            
-            print(f"✅ Got wellness response from {model_name}")
-            print(f"Response preview: {response_text[:150]}...")
-            
-            # Clean markdown
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            # Parse JSON
-            assessment_dict = json.loads(response_text)
-            
-            # Validate
-            if "risk_level" not in assessment_dict:
-                raise ValueError("Missing risk_level in response")
-            
-            print(f"✅ Burnout assessment complete: {assessment_dict['risk_level']} risk ({assessment_dict.get('risk_score', 0)}/100)")
-            return BurnoutAssessment(**assessment_dict)
-            
-        except Exception as e:
-            print(f"❌ {model_name} failed: {str(e)[:100]}")
-            continue
+    # Race all models; the first valid answer wins and the rest are cancelled
+    return await race_models(FREE_MODELS, context, _try_model)
+
+
+async def _try_model(model_name: str, context: str) -> Optional[BurnoutAssessment]:
+    """Ask a single model for an assessment. Returns None if it fails or times out."""
+    return await try_model(
+        model_name,
+        lambda: get_agent(
+            model_name,
+            "wellness",
+            system_prompt=WELLNESS_SYSTEM_PROMPT,
+        ),
+        context,
+        BurnoutAssessment,
+        REQUEST_TIMEOUT,
+    )
+
+
+class _MoodStats(NamedTuple):
+    """Aggregates over a mood history, shared by the prompt and the rules"""
+    avg_mood: float
+    mood_trend: float  # Least-squares slope of mood_score per day
+    overwork_days: int
+    low_focus_days: int
+    skipped_days: int
+
+
+def _mood_stats(mood_history: List[MoodEntry]) -> _MoodStats:
+    """Tally every burnout signal in a single pass over the history."""
+    n = len(mood_history)
+    total_mood = 0
+    weighted_mood = 0
+    overwork_days = 0
+    low_focus_days = 0
+    skipped_days = 0
+    for day, e in enumerate(mood_history):
+        total_mood += e.mood_score
+        weighted_mood += day * e.mood_score
+        if e.actual_hours > e.planned_hours:
+            overwork_days += 1
+        if e.focus_level == "Low":
+            low_focus_days += 1
+        if e.actual_hours < e.planned_hours * 0.7:
+            skipped_days += 1
+    
+    # Closed-form slope over day indices 0..n-1
+    if n >= 2:
+        mean_day = (n - 1) / 2
+        day_variance = n * (n * n - 1) / 12
+        mood_trend = (weighted_mood - mean_day * total_mood) / day_variance
+    else:
+        mood_trend = 0.0
     
-    # All models failed - use rule-based fallback
-    print("\n⚠️ All AI models failed. Using rule-based burnout detection.")
-    return detect_burnout_with_rules(mood_history)
+    return _MoodStats(
+        avg_mood=total_mood / n if n else 0.0,
+        mood_trend=mood_trend,
+        overwork_days=overwork_days,
+        low_focus_days=low_focus_days,
+        skipped_days=skipped_days,
+    )
 
 
 def detect_burnout_with_rules(mood_history: List[MoodEntry]) -> BurnoutAssessment:
     """Fallback: Detect burnout using algorithmic rules (no AI)."""
     
+    if not mood_history:
+        return BurnoutAssessment(
+            risk_level="Low",
+            risk_score=0.0,
+            signals=["No mood data yet - log a few check-ins for an assessment"],
+            recommendations=["Record your mood after each study day"],
+            should_adjust_plan=False
+        )
+    
     signals = []
     risk_score = 0
     
+    stats = _mood_stats(mood_history)
+    
     # Analyze mood trends
-    recent_moods = [e.mood_score for e in mood_history[-3:]]
-    if all(score <= 2 for score in recent_moods):
+    if all(e.mood_score <= 2 for e in mood_history[-3:]):
         signals.append("Last 3 days show consistent 'Tired' or 'Burned out' mood")
         risk_score += 30
     
-    avg_mood = sum(e.mood_score for e in mood_history) / len(mood_history)
-    if avg_mood < 2.5:
-        signals.append(f"Average mood is low ({avg_mood:.1f}/4)")
+    if stats.avg_mood < 2.5:
+        signals.append(f"Average mood is low ({stats.avg_mood:.1f}/4)")
         risk_score += 15
     
     # Check for overwork
-    overwork_days = sum(1 for e in mood_history if e.actual_hours > e.planned_hours)
-    if overwork_days >= 3:
-        signals.append(f"Exceeded planned hours on {overwork_days} days - overworking pattern detected")
+    if stats.overwork_days >= 3:
+        signals.append(f"Exceeded planned hours on {stats.overwork_days} days - overworking pattern detected")
         risk_score += 25
     
     # Check focus decline
-    low_focus_days = sum(1 for e in mood_history if e.focus_level == "Low")
-    if low_focus_days >= 3:
-        signals.append(f"Low focus reported for {low_focus_days} days - concentration declining")
+    if stats.low_focus_days >= 3:
+        signals.append(f"Low focus reported for {stats.low_focus_days} days - concentration declining")
         risk_score += 20
     
     # Check for skipped/reduced sessions
-    skipped = sum(1 for e in mood_history if e.actual_hours < e.planned_hours * 0.7)
-    if skipped >= 2:
-        signals.append(f"Significantly reduced or skipped study on {skipped} days - possible demotivation")
+    if stats.skipped_days >= 2:
+        signals.append(f"Significantly reduced or skipped study on {stats.skipped_days} days - possible demotivation")
         risk_score += 15
     
     # Determine risk level and recommendations
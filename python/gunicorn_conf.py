@@ -0,0 +1,31 @@
+"""Gunicorn settings for running the API under uvicorn workers.
+
+    gunicorn -c gunicorn_conf.py main:app
+
+Runs a single worker unless WEB_CONCURRENCY says otherwise. Each worker
+is its own process with its own response cache, model health stats and
+rate limiter (so N workers allow N times the OpenRouter rate), and
+background plan jobs only exist in the worker that accepted them - only
+raise WEB_CONCURRENCY behind sticky routing, or polling /api/plan-jobs
+will 404 when it lands on another worker.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Async workers on uvloop + httptools (picked up from uvicorn[standard])
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Seconds an idle client connection is held open
+keepalive = 30
+
+# LLM races can take a while; don't let gunicorn kill a busy worker early
+timeout = 120
+
+# No access log on the hot path
+accesslog = None
+
+# Import the app once in the master so workers fork with it already loaded.
+# The HTTP client is opened per worker in the app's lifespan, after the fork.
+preload_app = True
@@ -1,8 +1,13 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Body, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Annotated, Dict, List, Literal, Optional
+import asyncio
+import logging
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,9 +18,30 @@ from agents.planning import generate_study_plan, Subject, WeeklyPlan
 from agents.wellness import assess_burnout, MoodEntry, BurnoutAssessment
 from agents.adjustment import adjust_plan_for_burnout, AdjustedPlan
 from agents.planning import StudyPlan
+from agents._http import open_client, close_client, warm_up
+
+log = logging.getLogger(__name__)
+
+# Most plans the bulk endpoint generates at the same time
+BULK_CONCURRENCY = 32
+
+# Most plans one bulk request may ask for
+MAX_BULK_PLANS = 100
+_bulk_semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+# Seconds a finished background job stays available for polling
+JOB_TTL_S = 60 * 60
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open and pre-warm the shared OpenRouter connection pool for the app's lifetime"""
+    app.state.http = open_client()
+    await warm_up()
+    yield
+    await close_client()
 
 # Create FastAPI app
-app = FastAPI(title="Study Planner AI Backend")
+app = FastAPI(title="Study Planner AI Backend", lifespan=lifespan)
 
 # Enable CORS for Next.js frontend
 app.add_middleware(
@@ -41,13 +67,34 @@ class PlanRequest(BaseModel):
     start_date: str
 
 class BurnoutRequest(BaseModel):
-    mood_history: List[MoodEntry]
+    mood_history: List[MoodEntry] = Field(min_length=1)
 
 class AdjustRequest(BaseModel):
     current_plan: StudyPlan
     burnout_level: str
     upcoming_exams: List[dict]
 
+# ============================================
+# RESPONSE MODELS
+# ============================================
+
+class PlanResult(BaseModel):
+    """One item of a bulk plan request: the plan, or why it failed"""
+    plan: Optional[WeeklyPlan] = None
+    error: Optional[str] = None
+
+class PlanJob(BaseModel):
+    """Status of a background plan generation job"""
+    task_id: str
+    status: Literal["pending", "running", "done", "failed"] = "pending"
+    result: Optional[WeeklyPlan] = None
+    error: Optional[str] = None
+    finished_at: Optional[float] = Field(default=None, exclude=True)
+
+# Jobs by task_id, plus strong refs so running tasks aren't garbage collected
+_jobs: Dict[str, PlanJob] = {}
+_job_tasks: set = set()
+
 # ============================================
 # API ENDPOINTS
 # ============================================
@@ -76,8 +123,8 @@ async def create_plan(request: PlanRequest):
         return plan
     except Exception as e:
         # If AI fails (rate limit, etc), use fallback
-        print(f"AI generation failed: {e}")
-        print("Using fallback plan...")
+        log.warning("AI generation failed: %s", e)
+        log.warning("Using fallback plan...")
         
         from agents.planning import create_fallback_plan
         
@@ -88,6 +135,64 @@ async def create_plan(request: PlanRequest):
         )
         return plan
 
+@app.post("/api/generate-plans", response_model=List[PlanResult])
+async def create_plans(
+    requests: Annotated[List[PlanRequest], Body(max_length=MAX_BULK_PLANS)],
+):
+    """
+    Generate weekly study plans for many users concurrently
+    """
+    async def create_bounded(request: PlanRequest) -> WeeklyPlan:
+        async with _bulk_semaphore:
+            return await create_plan(request)
+    
+    # One bad item (e.g. an unparseable date) fails alone, not the batch
+    results = await asyncio.gather(*(create_bounded(r) for r in requests), return_exceptions=True)
+    return [
+        PlanResult(error=str(r)) if isinstance(r, BaseException) else PlanResult(plan=r)
+        for r in results
+    ]
+
+@app.post("/api/plan-jobs", response_model=PlanJob, status_code=202)
+async def submit_plan_job(request: PlanRequest):
+    """
+    Queue plan generation in the background and return a task_id to poll
+    """
+    # Forget jobs that finished long enough ago
+    now = time.monotonic()
+    for task_id in [t for t, j in _jobs.items() if j.finished_at and now - j.finished_at > JOB_TTL_S]:
+        del _jobs[task_id]
+    
+    job = PlanJob(task_id=uuid.uuid4().hex)
+    _jobs[job.task_id] = job
+    
+    task = asyncio.create_task(_run_plan_job(job, request))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    return job
+
+async def _run_plan_job(job: PlanJob, request: PlanRequest):
+    job.status = "running"
+    try:
+        job.result = await create_plan(request)
+        job.status = "done"
+    except Exception as e:
+        log.warning("Plan job %s failed: %s", job.task_id, e)
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished_at = time.monotonic()
+
+@app.get("/api/plan-jobs/{task_id}", response_model=PlanJob)
+def get_plan_job(task_id: str):
+    """
+    Poll a background plan generation job
+    """
+    job = _jobs.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown plan job: {task_id}")
+    return job
+
 @app.post("/api/check-burnout", response_model=BurnoutAssessment)
 async def check_burnout(request: BurnoutRequest):
     """
@@ -120,4 +225,12 @@ async def adjust_plan(request: AdjustRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",  # uvloop when installed (not on Windows)
+        http="httptools",
+        access_log=False,
+        proxy_headers=False,
+    )
\ No newline at end of file
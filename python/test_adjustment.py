@@ -1,4 +1,5 @@
 import asyncio
+import logging
 from agents.adjustment import adjust_plan_for_burnout
 from agents.planning import StudyPlan, DailyTask
 
@@ -56,8 +57,13 @@ async def test_adjustment():
     print(f"Rest days added: {adjusted.rest_days_added}")
     print(f"\nRationale: {adjusted.rationale}")
     print(f"\nModified tasks:")
-    for task in adjusted.modified_tasks:
-        print(f"  - {task.subject}: {task.duration_hours}h ({task.priority})")
+    print(adjusted.model_dump_json(indent=2, include={"modified_tasks"}))
 
 if __name__ == "__main__":
-    asyncio.run(test_adjustment())
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        import uvloop  # Faster event loop (not available on Windows)
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+    run(test_adjustment())
\ No newline at end of file
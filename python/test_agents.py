@@ -11,6 +11,7 @@ if not os.getenv("OPENROUTER_API_KEY"):
 print(f"✅ API Key loaded: {os.getenv('OPENROUTER_API_KEY')[:20]}...")
 
 import asyncio
+import logging
 from agents.planning import generate_study_plan, Subject
 from agents.wellness import assess_burnout, MoodEntry
 from agents.adjustment import adjust_plan_for_burnout
@@ -70,8 +71,7 @@ async def test_planning_agent():
     
     for day in plan.days[:2]:  # Show first 2 days
         print(f"\n📅 {day.date} ({day.total_hours} hours):")
-        for task in day.tasks:
-            print(f"  - {task.subject}: {task.topic} ({task.duration_hours}h) [{task.task_type}]")
+        print(day.model_dump_json(indent=2, include={"tasks"}))
     
     return plan
 
@@ -142,11 +142,17 @@ async def test_wellness_agent():
 
 async def main():
     """Run all tests"""
-    plan = await test_planning_agent()
-    assessment = await test_wellness_agent()
+    # The two agents share no data, so overlap their LLM round trips
+    plan, assessment = await asyncio.gather(test_planning_agent(), test_wellness_agent())
     
     print("\n\n✅ All agents tested successfully!")
     print("\nNext step: Integrate with Next.js frontend")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        import uvloop  # Faster event loop (not available on Windows)
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+    run(main())
\ No newline at end of file
@@ -0,0 +1,111 @@
+from dotenv import load_dotenv
+import os
+
+# Load environment variables BEFORE importing agents
+load_dotenv()
+
+if not os.getenv("OPENROUTER_API_KEY"):
+    raise ValueError("OPENROUTER_API_KEY not found in .env file!")
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import permutations
+from agents.planning import generate_study_plan, Subject
+from agents.wellness import assess_burnout, MoodEntry
+
+# Most synthetic users in flight at the same time
+MAX_WORKERS = 10
+
+# Seconds a single user's pipeline may take before it counts as failed
+TIMEOUT_PER_USER = 120.0
+
+BASE_SUBJECTS = [
+    Subject(name="Operating Systems", priority="High", difficulty="Hard",
+            is_weak=True, exam_date="2026-01-28", hours_needed=12.0),
+    Subject(name="Database Management", priority="High", difficulty="Medium",
+            is_weak=False, exam_date="2026-01-30", hours_needed=10.0),
+    Subject(name="Computer Networks", priority="Medium", difficulty="Medium",
+            is_weak=False, exam_date="2026-02-05", hours_needed=8.0),
+]
+
+MOOD_DATA = [
+    MoodEntry(date="2026-01-16", mood="Energized", mood_score=4, planned_hours=5.0, actual_hours=5.0, focus_level="High"),
+    MoodEntry(date="2026-01-17", mood="Okay", mood_score=3, planned_hours=5.0, actual_hours=6.0, focus_level="Medium"),
+    MoodEntry(date="2026-01-18", mood="Tired", mood_score=2, planned_hours=5.0, actual_hours=5.5, focus_level="Low"),
+    MoodEntry(date="2026-01-19", mood="Tired", mood_score=2, planned_hours=5.0, actual_hours=4.0, focus_level="Low"),
+    MoodEntry(date="2026-01-20", mood="Burned out", mood_score=1, planned_hours=5.0, actual_hours=2.0, focus_level="Low"),
+]
+
+
+def _shift(date: str, days: int) -> str:
+    return (datetime.fromisoformat(date) + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+async def run_user(user_id: int, semaphore: asyncio.Semaphore) -> float:
+    """Plan a week and assess burnout for one synthetic user. Returns seconds taken."""
+    orders = list(permutations(BASE_SUBJECTS))
+    rotation = user_id % len(MOOD_DATA)
+    # Shift every date per user so neither the response cache nor the
+    # in-flight map can serve repeats; exams move with the start date
+    subjects = [
+        s.model_copy(update={"exam_date": _shift(s.exam_date, user_id)})
+        for s in orders[user_id % len(orders)]
+    ]
+    start_date = _shift("2026-01-21", user_id)
+    mood_history = [
+        e.model_copy(update={"date": _shift(e.date, user_id)})
+        for e in MOOD_DATA[rotation:] + MOOD_DATA[:rotation]
+    ]
+
+    async with semaphore:
+        started = time.perf_counter()
+        await asyncio.wait_for(
+            asyncio.gather(
+                generate_study_plan(
+                    subjects=subjects,
+                    available_hours_per_day=5.0,
+                    fixed_commitments={"Monday": [[9, 15]]},
+                    start_date=start_date,
+                ),
+                assess_burnout(mood_history),
+            ),
+            timeout=TIMEOUT_PER_USER,
+        )
+        return time.perf_counter() - started
+
+
+async def perf_smoke(n_users: int = 50):
+    """Fan out n_users concurrent pipelines and report latency percentiles"""
+    print(f"\n=== PERF SMOKE: {n_users} users, {MAX_WORKERS} at a time ===\n")
+
+    semaphore = asyncio.Semaphore(MAX_WORKERS)
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_user(i, semaphore) for i in range(n_users)),
+        return_exceptions=True,
+    )
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r for r in results if isinstance(r, float))
+    failures = len(results) - len(latencies)
+
+    print(f"Completed: {len(latencies)}/{n_users} ({failures} failed) in {wall:.1f}s")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"p50: {cuts[49]:.2f}s | p95: {cuts[94]:.2f}s | max: {latencies[-1]:.2f}s")
+    elif latencies:
+        print(f"Latency: {latencies[0]:.2f}s")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    try:
+        import uvloop  # Faster event loop (not available on Windows)
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+    run(perf_smoke(n_users))